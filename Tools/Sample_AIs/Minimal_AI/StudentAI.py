@@ -1,5 +1,28 @@
+import math
+import random
+import time
+from collections import OrderedDict
+from itertools import chain
 from Move import Move
-import copy
+
+# open search window bounds
+NEG_INF = -math.inf
+POS_INF = math.inf
+
+# transposition table bound flags
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# zobrist piece index for (color, is_king)
+PIECE_KIND = {('B', False): 0, ('B', True): 1, ('W', False): 2, ('W', True): 3}
+
+# positions whose move lists are remembered, oldest dropped first
+MOVE_CACHE_SIZE = 20000
+
+# positions whose is_win results are remembered, oldest dropped first
+WIN_CACHE_SIZE = 20000
+
+# positions whose leaf evaluations are remembered, oldest dropped first
+EVAL_CACHE_SIZE = 50000
 
 class StudentAI:
     """
@@ -13,8 +36,36 @@ class StudentAI:
         self.k = k
         self.color = first  # 1 = Black, 2 = White
         self.opponent = {1: 2, 2: 1}
+        self._promo_row = row - 1 if first == 1 else 0  # row where our men crown
         self.board = None
-        self.max_depth = 2
+        self.max_depth = 30          # cap for iterative deepening
+        self.time_per_move = 0.7     # seconds of search per move
+
+        # transposition table: hash -> (depth, value, flag, best_move)
+        self.tt = {}
+        rng = random.Random(171)
+        self._zobrist = [[[rng.getrandbits(64) for _ in range(4)] for _ in range(col)] for _ in range(row)]
+        self._zobrist_side = rng.getrandbits(64)
+        self._hash = 0
+
+        # (hash, player) -> flat move list, see _get_all_moves
+        self._moves_cache = OrderedDict()
+        # (hash, player) -> board.is_win result, see _is_win
+        self._win_cache = OrderedDict()
+        # hash -> leaf value for the side to move, see _leaf_eval; unlike the
+        # transposition table it is kept across iterations and turns
+        self._eval_cache = OrderedDict()
+
+        # evaluation terms per color ('B'/'W'), kept in step with the board by _do_move/_undo_move
+        self._men = {'B': 0, 'W': 0}
+        self._kings = {'B': 0, 'W': 0}
+        self._center = {'B': 0, 'W': 0}
+        self._adv = {'B': 0, 'W': 0}
+
+        # principal variation of the last completed iteration, and the one being built
+        self._pv = []
+        self._pv_table = {}
+        self._deadline = 0.0
 
     def get_move(self, move):
         # lazy init
@@ -34,119 +85,273 @@ class StudentAI:
             return Move([])
 
         # flatten all moves
-        flat = [m for g in moves_grouped for m in g]
+        flat = list(chain.from_iterable(moves_grouped))
         if len(flat) == 1:
             chosen = flat[0]
             self.board.make_move(chosen, self.color)
             return chosen
 
-        alpha, beta = float("-inf"), float("inf")
-        best_score, best_move = float("-inf"), None
+        self._sync(self.board)
+        self._promo_row = self.row - 1 if self.color == 1 else 0
+        self.tt.clear()
+        self._pv = []
+        self._deadline = time.monotonic() + self.time_per_move
 
-        for m in self._order_moves(flat):
-            new_board = self._apply(self.board, m, self.color)
-            score = self._min_value(new_board, self.max_depth - 1, alpha, beta)
-            if score > best_score:
-                best_score, best_move = score, m
-            alpha = max(alpha, best_score)
-            if best_score >= beta:
+        # iterative deepening: keep the best move of the deepest finished search
+        best_move = self._order_moves(flat)[0]
+        for depth in range(1, self.max_depth + 1):
+            try:
+                best_move = self._search_root(flat, depth)
+            except TimeoutError:
                 break
 
         self.board.make_move(best_move, self.color)
         return best_move
 
-    # ---------- minimax ----------
-    def _max_value(self, board, depth, alpha, beta):
-        term = board.is_win(self.color)
-        if term != 0 or depth == 0:
-            return self._evaluate(board)
+    def _search_root(self, flat, depth):
+        # strict > keeps the first of several equally good moves
+        alpha, beta = NEG_INF, POS_INF
+        best_score, best_move = NEG_INF, None
 
-        moves = board.get_all_possible_moves(self.color)
-        if not moves:
-            return self._evaluate(board)
-
-        value = float("-inf")
-        for m in self._order_moves([mm for g in moves for mm in g]):
-            child = self._apply(board, m, self.color)
-            value = max(value, self._min_value(child, depth - 1, alpha, beta))
-            alpha = max(alpha, value)
-            if value >= beta:
-                break
-        return value
+        pv_move = self._pv[0] if self._pv else None
+        for m in self._order_moves(flat, pv_move=pv_move):
+            undo = self._do_move(self.board, m, self.color)
+            try:
+                score = -self._negamax(self.board, depth - 1, -beta, -alpha, self.opponent[self.color], 1)
+            finally:
+                self._undo_move(self.board, m, undo)
+            if score > best_score:
+                best_score, best_move = score, m
+                self._pv_table[0] = [m] + self._pv_table[1]
+                alpha = best_score
 
-    def _min_value(self, board, depth, alpha, beta):
-        term = board.is_win(self.opponent[self.color])
-        if term != 0 or depth == 0:
-            return self._evaluate(board)
+        self._pv = self._pv_table[0]
+        return best_move
+
+    # ---------- minimax ----------
+    def _negamax(self, board, depth, alpha, beta, side, ply):
+        # value of the position for side, the player to move
+        if time.monotonic() > self._deadline:
+            raise TimeoutError
+        self._pv_table[ply] = []
+        term = self._is_win(board, side)
+        if term != 0:
+            return self._evaluate_from(board, side)
+        if depth == 0:
+            return self._leaf_eval(board, side)
 
-        moves = board.get_all_possible_moves(self.opponent[self.color])
+        # entries are side-relative; the hash includes the side to move
+        alpha0, beta0 = alpha, beta
+        tt_move = None
+        entry = self.tt.get(self._hash)
+        if entry is not None:
+            e_depth, e_value, e_flag, tt_move = entry
+            if e_depth >= depth:
+                if e_flag == EXACT:
+                    return e_value
+                if e_flag == LOWER:
+                    if e_value > alpha:
+                        alpha = e_value
+                elif e_value < beta:
+                    beta = e_value
+                if alpha >= beta:
+                    return e_value
+
+        moves = self._get_all_moves(board, side)
         if not moves:
-            return self._evaluate(board)
-
-        value = float("inf")
-        for m in self._order_moves([mm for g in moves for mm in g]):
-            child = self._apply(board, m, self.opponent[self.color])
-            value = min(value, self._max_value(child, depth - 1, alpha, beta))
-            beta = min(beta, value)
-            if value <= alpha:
-                break
+            return self._evaluate_from(board, side)
+
+        other = self.opponent[side]
+        value, best_m = NEG_INF, None
+        pv_move = self._pv[ply] if ply < len(self._pv) else None
+        for m in self._order_moves(moves, tt_move, pv_move):
+            undo = self._do_move(board, m, side)
+            try:
+                score = -self._negamax(board, depth - 1, -beta, -alpha, other, ply + 1)
+            finally:
+                self._undo_move(board, m, undo)
+            if score > value:
+                value, best_m = score, m
+                self._pv_table[ply] = [m] + self._pv_table[ply + 1]
+                # raise alpha first so an equal score already closes the window
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+        self._tt_store(depth, value, alpha0, beta0, best_m)
         return value
 
+    def _tt_store(self, depth, value, alpha0, beta0, best_m):
+        # classify value against the window the node was searched with
+        if value <= alpha0:
+            flag = UPPER
+        elif value >= beta0:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt[self._hash] = (depth, value, flag, best_m)
+
     # ---------- helpers ----------
-    def _apply(self, board, move, who):
-        nb = copy.deepcopy(board)
-        nb.make_move(move, who)
-        return nb
-
-    def _order_moves(self, moves):
-        # prioritize captures and promotions
-        def key(m):
-            seq = m.seq
-            length = len(seq)
-            cap_bonus = max(0, length - 2) * 10
-            end_r, _ = seq[-1]
-            promo = 1 if (self.color == 1 and end_r == self.row - 1) or (self.color == 2 and end_r == 0) else 0
-            return cap_bonus + promo * 5
-        return sorted(moves, key=key, reverse=True)
+    def _get_all_moves(self, board, player):
+        # flat move list, memoized on the Zobrist hash; callers must not modify it
+        key = (self._hash, player)
+        moves = self._moves_cache.get(key)
+        if moves is None:
+            moves = list(chain.from_iterable(board.get_all_possible_moves(player)))
+            self._moves_cache[key] = moves
+            if len(self._moves_cache) > MOVE_CACHE_SIZE:
+                self._moves_cache.popitem(last=False)
+        return moves
 
-    # ---------- evaluation ----------
-    def _evaluate(self, board):
-        my_men = my_kings = opp_men = opp_kings = 0
-        my_center = opp_center = 0
-        my_adv = opp_adv = 0
+    def _is_win(self, board, player):
+        # board.is_win memoized on the Zobrist hash; the tie rule reads
+        # board.tie_counter, which the hash leaves out, so it is never cached
+        if board.tie_counter >= board.tie_max:
+            return -1
+        key = (self._hash, player)
+        result = self._win_cache.get(key)
+        if result is None:
+            result = board.is_win(player)
+            self._win_cache[key] = result
+            if len(self._win_cache) > WIN_CACHE_SIZE:
+                self._win_cache.popitem(last=False)
+        return result
+
+    def _do_move(self, board, move, who):
+        # make the move in place; return what _undo_move needs to reverse it
+        sr, sc = move.seq[0]
+        er, ec = move.seq[-1]
+        color = board.board[sr][sc].color
+        was_king = board.board[sr][sc].is_king
+        counters = (board.tie_counter, board.black_count, board.white_count)
+        board.make_move(move, who)
+        captured = board.saved_move.pop()[1]
+
+        z = self._zobrist
+        h = self._hash ^ self._zobrist_side ^ z[sr][sc][PIECE_KIND[color, was_king]]
+        for r, c, piece_color, piece_king in captured:
+            h ^= z[r][c][PIECE_KIND[piece_color, piece_king]]
+        is_king = board.board[er][ec].is_king
+        h ^= z[er][ec][PIECE_KIND[color, is_king]]
+        undo = (was_king, captured, counters, self._hash)
+        self._hash = h
+
+        self._count_piece(sr, sc, color, was_king, -1)
+        for r, c, piece_color, piece_king in captured:
+            self._count_piece(r, c, piece_color, piece_king, -1)
+        self._count_piece(er, ec, color, is_king, 1)
+        return undo
+
+    def _undo_move(self, board, move, undo):
+        was_king, captured, counters, self._hash = undo
+        sr, sc = move.seq[0]
+        er, ec = move.seq[-1]
+        color = board.board[er][ec].color
+        self._count_piece(er, ec, color, board.board[er][ec].is_king, -1)
+        for r, c, piece_color, piece_king in captured:
+            self._count_piece(r, c, piece_color, piece_king, 1)
+        self._count_piece(sr, sc, color, was_king, 1)
+
+        board.board[er][ec].color = '.'
+        board.board[er][ec].is_king = False
+        board.board[sr][sc].color = color
+        board.board[sr][sc].is_king = was_king
+        for r, c, piece_color, piece_king in captured:
+            board.board[r][c].color = piece_color
+            board.board[r][c].is_king = piece_king
+        board.tie_counter, board.black_count, board.white_count = counters
+
+    def _count_piece(self, r, c, color, king, sign):
+        # add (sign=1) or remove (sign=-1) one piece's share of the evaluation terms
+        if king:
+            self._kings[color] += sign
+        else:
+            self._men[color] += sign
+        if 1 <= r < self.row - 1 and 1 <= c < self.col - 1:
+            self._center[color] += sign
+        self._adv[color] += sign * (r if color == 'B' else self.row - 1 - r)
+
+    def _sync(self, board):
+        # rebuild the hash and evaluation terms from scratch
+        self._hash = self._compute_hash(board)
+        for terms in (self._men, self._kings, self._center, self._adv):
+            terms['B'] = terms['W'] = 0
+        for r in range(self.row):
+            for c in range(self.col):
+                piece = board.board[r][c]
+                if piece.color != '.':
+                    self._count_piece(r, c, piece.color, piece.is_king, 1)
 
+    def _compute_hash(self, board):
+        h = 0
         for r in range(self.row):
             for c in range(self.col):
                 piece = board.board[r][c]
-                if piece.color == '.':
-                    continue
-                me_color = 'B' if self.color == 1 else 'W'
-                opp_color = 'W' if self.color == 1 else 'B'
-
-                if piece.color == me_color:
-                    if piece.is_king: my_kings += 1
-                    else: my_men += 1
-                    if 1 <= r < self.row - 1 and 1 <= c < self.col - 1: my_center += 1
-                    my_adv += r if me_color == 'B' else (self.row - 1 - r)
-                elif piece.color == opp_color:
-                    if piece.is_king: opp_kings += 1
-                    else: opp_men += 1
-                    if 1 <= r < self.row - 1 and 1 <= c < self.col - 1: opp_center += 1
-                    opp_adv += r if opp_color == 'B' else (self.row - 1 - r)
-
-        my_moves = board.get_all_possible_moves(self.color)
-        opp_moves = board.get_all_possible_moves(self.opponent[self.color])
-        my_mob = sum(len(g) for g in my_moves)
-        opp_mob = sum(len(g) for g in opp_moves)
-
-        term = board.is_win(self.color)
+                if piece.color != '.':
+                    h ^= self._zobrist[r][c][PIECE_KIND[piece.color, piece.is_king]]
+        return h
+
+    def _order_moves(self, moves, tt_move=None, pv_move=None):
+        # PV move, then the transposition table's best move
+        head = []
+        for first in (pv_move, tt_move):
+            if first is None:
+                continue
+            for m in moves:
+                if m.seq == first.seq and m not in head:
+                    head.append(m)
+                    break
+
+        # captures are forced, so either every move jumps or none does;
+        # when they jump, only how many pieces they take tells them apart
+        first_seq = moves[0].seq
+        if abs(first_seq[0][0] - first_seq[1][0]) == 2:
+            rest = [m for m in moves if m not in head]
+            rest.sort(key=lambda m: len(m.seq), reverse=True)
+            return head + rest
+
+        # otherwise promotions ahead of quiet moves, one pass, no sort
+        promos, quiet = [], []
+        promo_row = self._promo_row
+        for m in moves:
+            if m in head:
+                continue
+            (promos if m.seq[-1][0] == promo_row else quiet).append(m)
+        return head + promos + quiet
+
+    # ---------- evaluation ----------
+    def _leaf_eval(self, board, side):
+        # leaves score mobility for the side to move only; the hash covers the
+        # side to move and the caller has ruled out terminal positions, ties
+        # included, so the value depends on the hash alone
+        value = self._eval_cache.get(self._hash)
+        if value is None:
+            value = self._evaluate_from(board, side, len(self._get_all_moves(board, side)))
+            self._eval_cache[self._hash] = value
+            if len(self._eval_cache) > EVAL_CACHE_SIZE:
+                self._eval_cache.popitem(last=False)
+        return value
+
+    def _evaluate_from(self, board, side, mobility=0):
+        # _evaluate scores for us; flip it when the opponent is to move
+        if side == self.color:
+            return self._evaluate(board, my_mob=mobility)
+        return -self._evaluate(board, opp_mob=mobility)
+
+    def _evaluate(self, board, my_mob=0, opp_mob=0):
+        # material, center and advancement come from the incrementally kept terms;
+        # mobility is counted by the caller, which already has the moves
+        me = 'B' if self.color == 1 else 'W'
+        opp = 'W' if self.color == 1 else 'B'
+
+        term = self._is_win(board, self.color)
         if term == self.color: return 10000
         if term == self.opponent[self.color]: return -10000
         if term == -1: return 0
 
-        score = 120 * (my_kings - opp_kings)
-        score += 50 * (my_men - opp_men)
+        score = 120 * (self._kings[me] - self._kings[opp])
+        score += 50 * (self._men[me] - self._men[opp])
         score += 6 * (my_mob - opp_mob)
-        score += 2 * (my_center - opp_center)
-        score += 1 * (my_adv - opp_adv)
+        score += 2 * (self._center[me] - self._center[opp])
+        score += 1 * (self._adv[me] - self._adv[opp])
         return score
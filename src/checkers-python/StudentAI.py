@@ -1,53 +1,138 @@
-import copy
 import math
+import random
 import time
-from random import choice
+from collections import OrderedDict
+
+import numpy as np
+
 from Move import Move
 
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional: without it the kernels below run as plain Python
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+# int8 grid code for (color, is_king): black positive, white negative
+PIECE_CODE = {("B", False): 1, ("B", True): 2, ("W", False): -1, ("W", True): -2}
+
+# zobrist piece index for (color, is_king)
+PIECE_KIND = {("B", False): 0, ("B", True): 1, ("W", False): 2, ("W", True): 3}
+
+# positions whose move lists are remembered, oldest dropped first
+MOVE_CACHE_SIZE = 20000
+
+# positions whose is_win results are remembered, oldest dropped first
+WIN_CACHE_SIZE = 20000
+
+# (row, col) steps, referred to below by their index
+DIRECTIONS = ((1, -1), (1, 1), (-1, -1), (-1, 1))
+
+# directions a piece explores, in the order Checker.get_possible_moves uses,
+# for (player, is_king): men only move forward, kings try forward first
+MOVE_DIRS = {(1, False): (0, 1), (1, True): (0, 1, 2, 3),
+             (2, False): (2, 3), (2, True): (2, 3, 0, 1)}
+
+# module-level aliases skip the math attribute lookup in the hot loops
+_log = math.log
+_sqrt = math.sqrt
+
+
+@njit(cache=True)
+def ucb_select(child_visits, child_wins, n_children, log_parent, c):
+    """
+    Index of the child with the highest UCB1 score.
+    log_parent is the log of the parent's visit count, computed once by the caller.
+    An unvisited child is returned straight away.
+    """
+    best_i = 0
+    best_score = -math.inf
+    for i in range(n_children):
+        visits = child_visits[i]
+        if visits == 0:
+            return i
+        score = child_wins[i] / visits + c * _sqrt(log_parent / visits)
+        if score > best_score:
+            best_score = score
+            best_i = i
+    return best_i
+
+
+@njit(cache=True)
+def material_balance(grid):
+    """
+    Black material minus white material on an int8 grid, kings counting 3.
+    """
+    black = np.count_nonzero(grid == 1) + 3 * np.count_nonzero(grid == 2)
+    white = np.count_nonzero(grid == -1) + 3 * np.count_nonzero(grid == -2)
+    return black - white
+
 
 class MCTSNode:
     """
     Node for Monte Carlo Tree Search.
-    Holds a board state, whose turn it is next, and statistics.
+    Holds whose turn it is next and statistics. The position itself lives on
+    the AI's shared board, which the search walks into this node via the
+    moves stored along the parent chain.
+    Children are stored as parallel arrays over this node's legal moves:
+    child_moves, child_visits, child_wins and child_subtree. A child's
+    MCTSNode is only created once it is expanded; until then its slot in
+    child_subtree is None and its visit count is 0. A node's own slot in its
+    parent's arrays is self.index.
     """
 
-    def __init__(self, board, player_to_move, ai, parent=None, move=None):
-        self.board = board
+    def __init__(self, board, player_to_move, ai, parent=None, move=None, index=0):
         self.player_to_move = player_to_move  
         self.ai = ai
 
         self.parent = parent
         self.move = move  
+        self.index = index
 
-        self.children = []
-        self.untried_moves = ai._get_all_moves(board, player_to_move)
-
-        self.wins = 0.0
+        self.child_moves = ai._get_all_moves(board, player_to_move)
+        n_moves = len(self.child_moves)
+        self.child_visits = np.zeros(n_moves)
+        self.child_wins = np.zeros(n_moves)
+        self.child_subtree = [None] * n_moves
         self.visits = 0
 
-    def is_fully_expanded(self):
-        return len(self.untried_moves) == 0
-
-    def is_terminal(self):
-        w_self = self.board.is_win(self.ai.color)
-        w_opp = self.board.is_win(self.ai.opponent[self.ai.color])
-        return (w_self != 0) or (w_opp != 0) or (len(self.untried_moves) == 0)
+    def is_terminal(self, board):
+        if not self.child_moves:
+            return True
+        ai = self.ai
+        if ai._is_win(board, ai.color) != 0:
+            return True
+        return ai._is_win(board, ai.opponent[ai.color]) != 0
 
     def best_child_ucb(self, c):
-        """Return child with highest UCB1 score."""
-        best_score = float("-inf")
-        best_child = None
-        for child in self.children:
-            if child.visits == 0:
-                score = float("inf")
-            else:
-                exploit = child.wins / child.visits
-                explore = math.sqrt(math.log(self.visits) / child.visits)
-                score = exploit + c * explore
-            if score > best_score:
-                best_score = score
-                best_child = child
-        return best_child
+        """Return the slot with highest UCB1 score; unvisited slots come first."""
+        # a parent that was never visited has only unvisited children
+        log_parent = _log(self.visits) if self.visits else 0.0
+        return ucb_select(self.child_visits, self.child_wins, len(self.child_moves), log_parent, c)
+
+    def child_by_move(self, move):
+        """
+        Return the expanded child reached by move, or None.
+        A linear scan: a checkers position has only a handful of moves.
+        """
+        seq = [tuple(p) for p in move.seq]
+        for i, m in enumerate(self.child_moves):
+            if m.seq == seq:
+                return self.child_subtree[i]
+        return None
+
+    def expand(self, board, i):
+        """
+        Create the child for slot i.
+        board must already show the position after child_moves[i].
+        """
+        child = MCTSNode(board, self.ai.opponent[self.player_to_move], self.ai,
+                         parent=self, move=self.child_moves[i], index=i)
+        self.child_subtree[i] = child
+        return child
 
 
 class StudentAI:
@@ -69,6 +154,62 @@ class StudentAI:
         self.exploration_c = 1.4
         self.time_per_move = 0.7
 
+        # int8 mirror of the board, kept in step by _do_move/_undo_move
+        self._grid = np.zeros((row, col), dtype=np.int8)
+
+        # with numba the kernels compile on their first call; make that call
+        # here, with the argument types the search uses, rather than inside
+        # the first move's time budget
+        ucb_select(np.zeros(1), np.zeros(1), 1, 0.0, self.exploration_c)
+        material_balance(self._grid)
+
+        # bitboards of the same position, bit r * col + c for square (r, c),
+        # kept in step the same way; _gen_moves generates moves from them
+        self._black = 0
+        self._white = 0
+        self._kings = 0
+        self._full = (1 << (row * col)) - 1
+        self._coords = [(r, c) for r in range(row) for c in range(col)]
+        # per square and direction: the square one step away, the square
+        # jumped over and the landing square, -1 when off the board
+        self._step = []
+        self._jump = []
+        for r, c in self._coords:
+            steps, jumps = [], []
+            for dr, dc in DIRECTIONS:
+                steps.append(self._square(r + dr, c + dc))
+                land = self._square(r + 2 * dr, c + 2 * dc)
+                jumps.append((self._square(r + dr, c + dc), land) if land >= 0 else (-1, -1))
+            self._step.append(steps)
+            self._jump.append(jumps)
+        # per direction: the index shift of one step, and the squares a jump
+        # can start from without leaving the board
+        self._jump_shift = []
+        for d, (dr, dc) in enumerate(DIRECTIONS):
+            starts = 0
+            for sq, jumps in enumerate(self._jump):
+                if jumps[d][1] >= 0:
+                    starts |= 1 << sq
+            self._jump_shift.append((dr * col + dc, starts))
+
+        # random source for rollouts
+        self._rng = random.Random()
+
+        # zobrist hash of the board, kept in step the same way
+        rng = random.Random(171)
+        self._zobrist = [[[rng.getrandbits(64) for _ in range(4)] for _ in range(col)] for _ in range(row)]
+        self._zobrist_side = rng.getrandbits(64)
+        self._hash = 0
+
+        # (hash, player) -> flat move list, see _get_all_moves
+        self._moves_cache = OrderedDict()
+        # (hash, player) -> board.is_win result, see _is_win
+        self._win_cache = OrderedDict()
+
+        # search tree of the last turn and the root slot we played from it
+        self._root = None
+        self._root_choice = 0
+
     def get_move(self, move):
         """
         Called by the game loop with the opponent's last move.
@@ -93,121 +234,360 @@ class StudentAI:
         if len(flat_moves) == 1:
             chosen = flat_moves[0]
             self.board.make_move(chosen, self.color)
+            self._root = None
             return chosen
 
         # --- MCTS SEARCH ---
-        root_board = copy.deepcopy(self.board)
-        root = MCTSNode(root_board, self.color, ai=self)
+        # every iteration walks self.board down the tree and back up again
+        board = self.board
+        self._sync(board)
+        root = self._reused_root(move)
+        if root is None:
+            root = MCTSNode(board, self.color, ai=self)
 
         end_time = time.time() + self.time_per_move
 
         while time.time() < end_time:
             node = root
-
-            while node.is_fully_expanded() and node.children:
-                node = node.best_child_ucb(self.exploration_c)
-
-            if node.untried_moves and not node.is_terminal():
-                m = node.untried_moves.pop()
-                next_board = copy.deepcopy(node.board)
-                next_board.make_move(m, node.player_to_move)
-                next_player = self.opponent[node.player_to_move]
-                child = MCTSNode(next_board, next_player, ai=self, parent=node, move=m)
-                node.children.append(child)
+            path = []
+
+            # descend by UCB1 until it picks a slot that has no node yet, then expand it
+            while node.child_moves:
+                i = node.best_child_ucb(self.exploration_c)
+                child = node.child_subtree[i]
+                if child is None and node.is_terminal(board):
+                    break
+                m = node.child_moves[i]
+                path.append((m, self._do_move(board, m, node.player_to_move)))
+                if child is None:
+                    node = node.expand(board, i)
+                    break
                 node = child
 
-            winner = self._rollout(node.board, node.player_to_move)
+            reward = self._reward(self._rollout(board, node.player_to_move))
+            self._backpropagate(node, reward)
 
-            self._backpropagate(node, winner)
+            for m, undo in reversed(path):
+                self._undo_move(board, m, undo)
 
-        if not root.children:
-            chosen = flat_moves[0]
-        else:
-            best_child = max(root.children, key=lambda c: c.visits)
-            chosen = best_child.move
+        # most visited root move; the first move if no iteration finished
+        self._root = root
+        self._root_choice = int(np.argmax(root.child_visits))
+        chosen = root.child_moves[self._root_choice]
 
         self.board.make_move(chosen, self.color)
         return chosen
 
     # ---------- helpers  ----------
 
+    def _reused_root(self, opp_move):
+        """
+        Carry last turn's statistics over: follow our last move and then
+        opp_move down the old tree. Return that subtree detached from its
+        parent, or None if the position was never expanded.
+        """
+        if self._root is None or len(opp_move) == 0:
+            return None
+        node = self._root.child_subtree[self._root_choice]
+        if node is None:
+            return None
+        node = node.child_by_move(opp_move)
+        if node is None:
+            return None
+        node.parent = None
+        return node
+
     def _get_all_moves(self, board, player):
-        groups = board.get_all_possible_moves(player)
-        if not groups:
-            return []
-        return [m for g in groups for m in g]
+        """
+        Flat list of player's moves, memoized on the Zobrist hash.
+        The moves come from the bitboards, which mirror board.
+        Callers must not modify the returned list.
+        """
+        key = (self._hash, player)
+        moves = self._moves_cache.get(key)
+        if moves is None:
+            moves = self._gen_moves(player)
+            self._moves_cache[key] = moves
+            if len(self._moves_cache) > MOVE_CACHE_SIZE:
+                self._moves_cache.popitem(last=False)
+        return moves
+
+    def _is_win(self, board, player):
+        """
+        Same result as board.is_win(player), memoized on the Zobrist hash.
+        The move lists it needs come from _get_all_moves rather than from
+        board. The tie rule depends on board.tie_counter, which the hash
+        does not cover, so it is checked here and never cached.
+        """
+        if board.tie_counter >= board.tie_max:
+            return -1
+        key = (self._hash, player)
+        result = self._win_cache.get(key)
+        if result is None:
+            black_moves = white_moves = True
+            if not self._get_all_moves(board, 1):
+                black_moves = player == 1
+            elif not self._get_all_moves(board, 2):
+                white_moves = player == 2
+            if white_moves and not black_moves:
+                result = 2
+            elif black_moves and not white_moves:
+                result = 1
+            elif not self._white:
+                result = 2
+            elif not self._black:
+                result = 1
+            else:
+                result = 0
+            self._win_cache[key] = result
+            if len(self._win_cache) > WIN_CACHE_SIZE:
+                self._win_cache.popitem(last=False)
+        return result
+
+    def _square(self, r, c):
+        # bit index of (r, c), or -1 off the board
+        if 0 <= r < self.row and 0 <= c < self.col:
+            return r * self.col + c
+        return -1
+
+    def _gen_moves(self, player):
+        """
+        Flat list of player's moves generated from the bitboards.
+        Matches board.get_all_possible_moves flattened: pieces in row-major
+        order, each exploring MOVE_DIRS in turn, and captures, when there are
+        any, replacing every plain move.
+        """
+        kings = self._kings
+        if player == 1:
+            own, opp = self._black, self._white
+        else:
+            own, opp = self._white, self._black
+        empty = self._full & ~(own | opp)
+        man_dirs, king_dirs = MOVE_DIRS[player, False], MOVE_DIRS[player, True]
+
+        # one shift per direction tells whether any piece can capture
+        capture = False
+        for d, (shift, starts) in enumerate(self._jump_shift):
+            movers = (own if d in man_dirs else own & kings) & starts
+            if shift > 0:
+                capture = ((((movers << shift) & opp) << shift) & empty) != 0
+            else:
+                capture = ((((movers >> -shift) & opp) >> -shift) & empty) != 0
+            if capture:
+                break
+
+        coords = self._coords
+        moves = []
+        pieces = own
+        while pieces:
+            low = pieces & -pieces
+            pieces ^= low
+            sq = low.bit_length() - 1
+            dirs = king_dirs if kings & low else man_dirs
+            if capture:
+                # the moving piece has left its square while it jumps
+                self._gen_jumps(sq, dirs, opp, empty | low, [coords[sq]], moves)
+            else:
+                step = self._step[sq]
+                for d in dirs:
+                    to = step[d]
+                    if to >= 0 and empty >> to & 1:
+                        moves.append(Move([coords[sq], coords[to]]))
+        return moves
+
+    def _gen_jumps(self, sq, dirs, opp, empty, path, moves):
+        """
+        Append to moves every maximal jump sequence continuing path from sq.
+        Jumped pieces are taken off opp as the search goes, as in
+        Checker.binary_tree_traversal.
+        """
+        jump = self._jump[sq]
+        extended = False
+        for d in dirs:
+            over, land = jump[d]
+            if over >= 0 and opp >> over & 1 and empty >> land & 1:
+                extended = True
+                path.append(self._coords[land])
+                taken = 1 << over
+                self._gen_jumps(land, dirs, opp ^ taken, empty | taken, path, moves)
+                path.pop()
+        if not extended and len(path) > 1:
+            moves.append(Move(path))
+
+    def _do_move(self, board, move, who):
+        """
+        Make move on board in place.
+        Return the state _undo_move needs to take it back.
+        """
+        sr, sc = move.seq[0]
+        er, ec = move.seq[-1]
+        color = board.board[sr][sc].color
+        was_king = board.board[sr][sc].is_king
+        counters = (board.tie_counter, board.black_count, board.white_count)
+        board.make_move(move, who)
+        captured = board.saved_move.pop()[1]
+
+        is_king = board.board[er][ec].is_king
+        grid = self._grid
+        grid[sr, sc] = 0
+        for r, c, _, _ in captured:
+            grid[r, c] = 0
+        grid[er, ec] = PIECE_CODE[color, is_king]
+
+        z = self._zobrist
+        h = self._hash ^ self._zobrist_side ^ z[sr][sc][PIECE_KIND[color, was_king]]
+        for r, c, piece_color, piece_king in captured:
+            h ^= z[r][c][PIECE_KIND[piece_color, piece_king]]
+        h ^= z[er][ec][PIECE_KIND[color, is_king]]
+        undo = (was_king, captured, counters, self._hash, (self._black, self._white, self._kings))
+        self._hash = h
+
+        col = self.col
+        start = 1 << (sr * col + sc)
+        end = 1 << (er * col + ec)
+        taken = 0
+        for r, c, _, _ in captured:
+            taken |= 1 << (r * col + c)
+        # clear before set: a king's jumps can bring it back to its start square
+        if color == "B":
+            self._black = (self._black & ~start) | end
+            self._white &= ~taken
+        else:
+            self._white = (self._white & ~start) | end
+            self._black &= ~taken
+        self._kings &= ~(start | taken)
+        if is_king:
+            self._kings |= end
+        return undo
+
+    def _undo_move(self, board, move, undo):
+        """
+        Reverse a move made by _do_move: put the mover back on its start
+        square (un-promoting it if needed) and restore captured pieces.
+        """
+        was_king, captured, counters, self._hash, bitboards = undo
+        self._black, self._white, self._kings = bitboards
+        sr, sc = move.seq[0]
+        er, ec = move.seq[-1]
+        color = board.board[er][ec].color
+        board.board[er][ec].color = "."
+        board.board[er][ec].is_king = False
+        board.board[sr][sc].color = color
+        board.board[sr][sc].is_king = was_king
+        for r, c, piece_color, piece_king in captured:
+            board.board[r][c].color = piece_color
+            board.board[r][c].is_king = piece_king
+        board.tie_counter, board.black_count, board.white_count = counters
+
+        grid = self._grid
+        grid[er, ec] = 0
+        grid[sr, sc] = PIECE_CODE[color, was_king]
+        for r, c, piece_color, piece_king in captured:
+            grid[r, c] = PIECE_CODE[piece_color, piece_king]
+
+    def _sync(self, board):
+        """
+        Rebuild the int8 grid, the bitboards and the Zobrist hash from board.
+        """
+        self._grid.fill(0)
+        self._hash = 0
+        self._black = self._white = self._kings = 0
+        for r in range(self.row):
+            for c in range(self.col):
+                piece = board.board[r][c]
+                if piece.color != ".":
+                    self._grid[r, c] = PIECE_CODE[piece.color, piece.is_king]
+                    self._hash ^= self._zobrist[r][c][PIECE_KIND[piece.color, piece.is_king]]
+                    bit = 1 << (r * self.col + c)
+                    if piece.color == "B":
+                        self._black |= bit
+                    else:
+                        self._white |= bit
+                    if piece.is_king:
+                        self._kings |= bit
 
     def _rollout(self, board, player_to_move, max_steps=80):
         """
         Play random moves until terminal or max_steps reached.
+        The moves are undone afterwards, so board is left as it was passed in.
         Return the winner: self.color, self.opponent[self.color], or -1 for draw.
         """
+        # bind everything the loop touches to locals
+        me = self.color
+        opponent = self.opponent
+        opp = opponent[me]
+        pick = self._rng.choice
+        is_win = self._is_win
+        get_moves = self._get_all_moves
+        do_move = self._do_move
+
         current_player = player_to_move
-        steps = 0
-        tmp_board = copy.deepcopy(board)
-
-        while steps < max_steps:
-            steps += 1
-
-            w_self = tmp_board.is_win(self.color)
-            w_opp = tmp_board.is_win(self.opponent[self.color])
-            if w_self == self.color:
-                return self.color
-            if w_opp == self.opponent[self.color]:
-                return self.opponent[self.color]
-            if w_self == -1 or w_opp == -1:
-                return -1  
-
-            moves = self._get_all_moves(tmp_board, current_player)
+        played = []
+
+        for _ in range(max_steps):
+            # the opponent's check is only needed while ours finds nothing
+            result = is_win(board, me)
+            if result == 0:
+                result = is_win(board, opp)
+            if result != 0:
+                winner = result
+                break
+
+            moves = get_moves(board, current_player)
             if not moves:
-                return self.opponent[current_player]
+                winner = opponent[current_player]
+                break
 
-            m = choice(moves)
-            tmp_board.make_move(m, current_player)
-            current_player = self.opponent[current_player]
+            m = pick(moves)
+            played.append((m, do_move(board, m, current_player)))
+            current_player = opponent[current_player]
+        else:
+            winner = self._material_winner(board)
 
-        return self._material_winner(tmp_board)
+        for m, undo in reversed(played):
+            self._undo_move(board, m, undo)
+        return winner
 
     def _material_winner(self, board):
         """
         Heuristic winner if rollout doesn't finish in time:
         whoever has more material (kings weighted more).
+        Counted on the int8 grid, which mirrors board.
         """
-        my_color_char = "W" if self.color == 1 else "B"
-        opp_color_char = "B" if self.color == 1 else "W"
+        balance = material_balance(self._grid)
+        # player 1 plays black
+        if self.color == 2:
+            balance = -balance
 
-        my_score = 0
-        opp_score = 0
-
-        for r in range(self.row):
-            for c in range(self.col):
-                piece = board.board[r][c]
-                if piece == ".":
-                    continue
-                pcolor = getattr(piece, "color", ".")
-                king = getattr(piece, "is_king", False)
-                val = 3 if king else 1
-
-                if pcolor == my_color_char:
-                    my_score += val
-                elif pcolor == opp_color_char:
-                    opp_score += val
-
-        if my_score > opp_score:
+        if balance > 0:
             return self.color
-        elif opp_score > my_score:
+        elif balance < 0:
             return self.opponent[self.color]
         else:
             return -1  
 
-    def _backpropagate(self, node, winner):
+    def _reward(self, winner):
+        """
+        Rollout result from our side: 1 for a win, 0.5 for a draw, 0 for a loss.
+        """
+        if winner == self.color:
+            return 1.0
+        elif winner == -1:
+            return 0.5
+        else:
+            return 0.0
+
+    def _backpropagate(self, node, reward, visits=1):
         """
         Update visits and wins along the path back to the root.
+        reward is the summed reward of the visits rollouts played from node,
+        so a batch of rollouts from one leaf is backed up in a single pass.
+        A node's wins live in its parent's child_wins array.
         """
         while node is not None:
-            node.visits += 1
-            if winner == self.color:
-                node.wins += 1.0
-            elif winner == -1:
-                node.wins += 0.5  
-            node = node.parent
+            node.visits += visits
+            parent = node.parent
+            if parent is not None:
+                parent.child_visits[node.index] += visits
+                parent.child_wins[node.index] += reward
+            node = parent